@@ -16,7 +16,7 @@ Tính năng chính:
 
 Yêu cầu:
  - Python 3.8+
- - pip install requests keyring pygments ttkbootstrap (tùy chọn)
+ - pip install requests keyring pygments ttkbootstrap requests-toolbelt orjson isal brotli (tùy chọn)
 
 Build .exe với PyInstaller (gợi ý):
  pip install pyinstaller
@@ -26,25 +26,51 @@ Ghi chú: Code có comment tiếng Việt để dễ hiểu cho học sinh.
 """
 
 import os
+import re
 import sys
 import json
+import math
 import base64
+import fnmatch
+import gzip
+import hashlib
 import threading
 import queue
+import struct
 import time
 import traceback
+import unicodedata
+import uuid
 import zipfile
-from functools import partial
-from urllib.parse import quote_plus
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import accumulate
+from urllib.parse import quote
 
 # Thử import các thư viện tùy chọn
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     REQUESTS_AVAILABLE = True
 except Exception:
     requests = None
+    HTTPAdapter = None
+    Retry = None
     REQUESTS_AVAILABLE = False
 
+# requests-toolbelt: upload multipart dạng stream (không đọc cả file vào RAM)
+try:
+    from requests_toolbelt import MultipartEncoder, MultipartEncoderMonitor
+    TOOLBELT_AVAILABLE = True
+except Exception:
+    MultipartEncoder = None
+    MultipartEncoderMonitor = None
+    TOOLBELT_AVAILABLE = False
+
 try:
     import keyring
     KEYRING_AVAILABLE = True
@@ -53,13 +79,39 @@ except Exception:
     KEYRING_AVAILABLE = False
 
 try:
-    from pygments import lex
     from pygments.lexers import get_lexer_for_filename, guess_lexer
     from pygments.token import Token
     PYGMENTS_AVAILABLE = True
 except Exception:
     PYGMENTS_AVAILABLE = False
 
+# ISA-L (python-isal): deflate/crc32 dùng SIMD, nhanh hơn zlib chuẩn nhiều lần; không có thì dùng zlib
+try:
+    from isal import isal_zlib as deflate_lib
+    ISAL_AVAILABLE = True
+except Exception:
+    deflate_lib = zlib
+    ISAL_AVAILABLE = False
+
+# brotli: urllib3 chỉ giải nén được 'br' khi có brotli/brotlicffi, nên chỉ xin 'br' khi đã cài
+try:
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except Exception:
+    try:
+        import brotlicffi  # noqa: F401
+        BROTLI_AVAILABLE = True
+    except Exception:
+        BROTLI_AVAILABLE = False
+
+# orjson: serialize/parse cache nhanh hơn json chuẩn; không có thì dùng json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except Exception:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
 # ttkbootstrap hỗ trợ theme dark; nếu không có, ta dùng ttk.Style thủ công
 try:
     import ttkbootstrap as tb
@@ -79,6 +131,53 @@ CACHE_FILE = os.path.join(os.path.expanduser('~'), '.gitlab_gui_cache.json')
 TOKEN_FILE_FALLBACK = os.path.join(os.path.expanduser('~'), '.gitlab_gui_token')
 KEYRING_SERVICE = 'gitlab_gui_pro_full'
 KEYRING_USER = 'token'
+# Số kết nối giữ trong pool của Session và số thread tải song song các trang API
+HTTP_POOL_SIZE = 16
+PAGE_WORKERS = 8
+# Đuôi file đã nén sẵn: nén lại gần như không giảm dung lượng, chỉ tốn CPU
+COMPRESSED_EXTS = {'.jpg', '.jpeg', '.png', '.gif', '.webp', '.mp3', '.mp4', '.mkv', '.avi', '.mov',
+                   '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.jar', '.whl', '.pdf', '.docx', '.xlsx'}
+# Upload folder: mặc định bỏ qua các thư mục này (pattern kiểu glob, áp cho tên thư mục/file)
+EXCLUDE_DIRS = ('.git', 'node_modules', '__pycache__', '.venv', 'venv', 'dist', 'build')
+# Upload folder: bỏ qua file lớn hơn ngưỡng này (MiB, chỉnh được trong popup upload)
+UPLOAD_MAX_FILE_MB = 100
+# Upload nhỏ hơn ngưỡng này không mở cửa sổ progress (xong gần như ngay, chỉ báo toast)
+PROGRESS_MIN_BYTES = 256 * 1024
+# Log tab: giữ tối đa số dòng này (xóa dòng cũ nhất khi vượt)
+LOG_MAX_LINES = 5000
+# Treeview: số node chèn mỗi lần, phần còn lại chèn ở các tick sau
+TREE_CHUNK = 50
+# iid node giữ chỗ (lazy-load) = tiền tố + iid node cha; iid thật bắt đầu bằng group_/project_/tree_/blob_...
+# nên không trùng được, kể cả file tên '*_dummy'
+DUMMY_PREFIX = 'dummy:'
+# commit_files: chia nhiều commit nếu quá số action / kích thước JSON
+COMMIT_BATCH_ACTIONS = 50
+COMMIT_BATCH_BYTES = 1024 * 1024
+# Thông tin /projects/:id được cache trong bộ nhớ bao lâu (giây)
+PROJECT_INFO_TTL = 60
+# Viewer: chỉ tải tối đa chừng này byte để xem (Download file thì không giới hạn)
+VIEWER_MAX_BYTES = 4 * 1024 * 1024
+# Cache ETag (LRU): tối đa số mục và tổng byte nội dung file; file lớn hơn VIEWER_MAX_BYTES không cache
+ETAG_CACHE_ENTRIES = 256
+ETAG_CACHE_BYTES = 32 * 1024 * 1024
+# Highlight: bỏ qua file lớn; lex cả file ở thread nền, áp màu theo khối dòng quanh vùng đang hiển thị
+HIGHLIGHT_MAX_BYTES = 256 * 1024
+HIGHLIGHT_MAX_LINES = 5000
+# File dạng dữ liệu/log: highlight không có ích, hiển thị text thường
+HIGHLIGHT_SKIP_SUFFIXES = ('.min.js', '.min.css', '.log', '.csv')
+HIGHLIGHT_BLOCK = 200
+HIGHLIGHT_MARGIN = 50
+HIGHLIGHT_OPS_PER_TICK = 2000
+# Số file giữ kết quả lex để mở lại không phải lex lại
+HIGHLIGHT_CACHE_SIZE = 32
+# Map token type -> màu đơn giản
+TOKEN_COLORS = {
+    'Token.Comment': '#888888',
+    'Token.Keyword': '#0000FF',
+    'Token.Name.Function': '#007F00',
+    'Token.Literal.String': '#B22222',
+    'Token.Literal.Number': '#FF00FF',
+}
 
 # ---------------------------
 # Hàm lưu / load token
@@ -135,47 +234,147 @@ def delete_saved_token():
 # ---------------------------
 # GitLabClient: wrapper API
 # ---------------------------
+# Nội dung lỗi 400 khi server không giải nén body gzip: JSON không parse được hoặc mất hết tham số
+_GZIP_REJECT_HINT = re.compile(r'json|pars(e|ing)|branch is missing|actions is missing', re.IGNORECASE)
+
+class FileTooLargeError(Exception):
+    """File vượt max_bytes khi tải để xem (viewer báo và gợi ý Download)"""
+
+
 class GitLabClient:
     def __init__(self, token: str = None, base_url: str = BASE_URL):
         self.base_url = base_url.rstrip('/')
         self.token = token
         self.headers = {}
+        # Session dùng chung: giữ kết nối keep-alive, không phải bắt tay TLS mỗi lần gọi
+        self.session = requests.Session()
+        # Tự thử lại (GET) khi gateway lỗi tạm thời 502/503/504
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Cache ETag trong bộ nhớ (LRU): (loại, project_id, path, ref) -> (etag, dữ liệu)
+        self._etag_cache = OrderedDict()
+        self._etag_bytes = 0
+        self._etag_lock = threading.Lock()
+        # Server có nhận body gzip không (tắt nếu bị từ chối)
+        self._gzip_body_ok = True
+        # project_id -> (thời điểm lấy, dữ liệu /projects/:id)
+        self._project_cache = {}
+        # project_id -> ".../projects/:id/repository/files/" (tạo một lần cho mỗi project)
+        self._project_prefix = {}
         if token:
             self.set_token(token)
 
     def set_token(self, token: str):
         self.token = token.strip()
         self.headers = {
+            # PRIVATE-TOKEN là đủ để xác thực, không gửi thêm Authorization: Bearer
             'PRIVATE-TOKEN': self.token,
-            'Authorization': f'Bearer {self.token}',
-            'Content-Type': 'application/json'
+            # Không đặt Content-Type mặc định: POST dùng json= (requests tự thêm), GET không cần
+            'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate'
         }
+        # Session mang sẵn header xác thực cho mọi request
+        self.session.headers.update(self.headers)
 
     def test(self):
-        r = requests.get(f"{self.base_url}/user", headers=self.headers, timeout=10)
+        r = self.session.get(f"{self.base_url}/user", timeout=10)
         if r.status_code == 200:
             return r.json()
         raise requests.HTTPError(f"{r.status_code}: {r.text}")
 
-    def _paged_get(self, path, params=None):
-        page = 1
+    def _paged_get(self, path, params=None, etag_key=None):
+        """GET tất cả các trang. etag_key: gửi If-None-Match cho trang 1; chỉ cache kết quả
+        vừa một trang (ETag của trang 1 không phản ánh thay đổi ở các trang sau)"""
         per_page = 100
-        res = []
-        while True:
+        url = f"{self.base_url}{path}"
+
+        def fetch_page(page, headers=None):
             p = dict(params or {})
             p.update({'page': page, 'per_page': per_page})
-            r = requests.get(f"{self.base_url}{path}", headers=self.headers, params=p, timeout=20)
-            if r.status_code != 200:
+            r = self.session.get(url, params=p, headers=headers, timeout=20)
+            if r.status_code != 200 and not (r.status_code == 304 and headers):
                 raise requests.HTTPError(f"{r.status_code}: {r.text}")
+            return r
+
+        cached = self._etag_lookup(etag_key) if etag_key is not None else None
+        r = fetch_page(1, {'If-None-Match': cached[0]} if cached else None)
+        if r.status_code == 304:
+            return cached[1]
+        res = list(r.json())
+        # GitLab trả X-Total-Pages => tải các trang 2..N song song, giữ đúng thứ tự trang
+        total_pages = int(r.headers.get('X-Total-Pages') or 0)
+        if total_pages > 1:
+            with ThreadPoolExecutor(max_workers=min(PAGE_WORKERS, total_pages - 1)) as ex:
+                for rp in ex.map(fetch_page, range(2, total_pages + 1)):
+                    res.extend(rp.json())
+            return res
+        etag = r.headers.get('ETag')
+        # Không có X-Total-Pages (ví dụ > 10.000 bản ghi): đi tuần tự theo X-Next-Page
+        page, data = 1, res
+        while True:
+            if 'X-Next-Page' in r.headers:
+                nxt = r.headers.get('X-Next-Page')
+                page = int(nxt) if nxt else None
+            else:
+                page = page + 1 if len(data) >= per_page else None
+            if not page:
+                break
+            etag = None
+            r = fetch_page(page)
             data = r.json()
             if not data:
                 break
             res.extend(data)
-            if len(data) < per_page:
-                break
-            page += 1
+        if etag_key is not None and etag:
+            self._etag_store(etag_key, etag, res)
         return res
 
+    def _etag_lookup(self, key):
+        with self._etag_lock:
+            cached = self._etag_cache.get(key)
+            if cached is not None:
+                self._etag_cache.move_to_end(key)
+            return cached
+
+    @staticmethod
+    def _etag_size(data):
+        # chỉ nội dung file (bytes) tính vào giới hạn byte, JSON list/dict tính theo số mục
+        return len(data) if isinstance(data, (bytes, bytearray)) else 0
+
+    def _etag_store(self, key, etag, data):
+        # file lớn hơn VIEWER_MAX_BYTES (download) không giữ trong RAM
+        size = self._etag_size(data)
+        with self._etag_lock:
+            old = self._etag_cache.pop(key, None)
+            if old is not None:
+                self._etag_bytes -= self._etag_size(old[1])
+            if size > VIEWER_MAX_BYTES:
+                return
+            self._etag_cache[key] = (etag, data)
+            self._etag_bytes += size
+            while len(self._etag_cache) > ETAG_CACHE_ENTRIES or self._etag_bytes > ETAG_CACHE_BYTES:
+                _, (_, old_data) = self._etag_cache.popitem(last=False)
+                self._etag_bytes -= self._etag_size(old_data)
+
+    def _etag_get(self, key, url, params, parse, timeout, stream=False):
+        """GET có If-None-Match: server trả 304 thì dùng lại dữ liệu đã cache"""
+        cached = self._etag_lookup(key)
+        headers = {'If-None-Match': cached[0]} if cached else None
+        r = self.session.get(url, headers=headers, params=params, timeout=timeout, stream=stream)
+        try:
+            if r.status_code == 304 and cached:
+                return cached[1]
+            if r.status_code == 200:
+                data = parse(r)
+                etag = r.headers.get('ETag')
+                if etag:
+                    self._etag_store(key, etag, data)
+                return data
+            raise requests.HTTPError(f"{r.status_code}: {r.text}")
+        finally:
+            r.close()
+
     def list_groups(self):
         return self._paged_get('/groups')
 
@@ -183,7 +382,7 @@ class GitLabClient:
         payload = {'name': name.strip(), 'path': slugify(name)}
         if parent_id:
             payload['parent_id'] = parent_id
-        r = requests.post(f"{self.base_url}/groups", headers=self.headers, json=payload, timeout=15)
+        r = self.session.post(f"{self.base_url}/groups", json=payload, timeout=15)
         if r.status_code in (200,201):
             return r.json()
         raise requests.HTTPError(f"{r.status_code}: {r.text}")
@@ -192,50 +391,143 @@ class GitLabClient:
         payload = {'name': name.strip()}
         if namespace_id:
             payload['namespace_id'] = namespace_id
-        r = requests.post(f"{self.base_url}/projects", headers=self.headers, json=payload, timeout=20)
+        r = self.session.post(f"{self.base_url}/projects", json=payload, timeout=20)
         if r.status_code in (200,201):
             return r.json()
         raise requests.HTTPError(f"{r.status_code}: {r.text}")
 
     def list_projects_in_group(self, group_id):
-        r = requests.get(f"{self.base_url}/groups/{group_id}/projects", headers=self.headers, params={'per_page':100}, timeout=20)
+        r = self.session.get(f"{self.base_url}/groups/{group_id}/projects", params={'per_page':100}, timeout=20)
         if r.status_code == 200:
             return r.json()
         raise requests.HTTPError(f"{r.status_code}: {r.text}")
 
+    def get_project(self, project_id):
+        """GET /projects/:id, cache PROJECT_INFO_TTL giây (dùng last_activity_at, default_branch)"""
+        cached = self._project_cache.get(project_id)
+        if cached and time.time() - cached[0] < PROJECT_INFO_TTL:
+            return cached[1]
+        r = self.session.get(f"{self.base_url}/projects/{project_id}", timeout=15)
+        if r.status_code == 200:
+            data = r.json()
+            self._project_cache[project_id] = (time.time(), data)
+            return data
+        raise requests.HTTPError(f"{r.status_code}: {r.text}")
+
     def list_repository_tree(self, project_id, path='', ref='master'):
-        params = {'per_page':100}
+        params = {}
         if path:
             params['path'] = path
         if ref:
             params['ref'] = ref
-        r = requests.get(f"{self.base_url}/projects/{project_id}/repository/tree", headers=self.headers, params=params, timeout=20)
-        if r.status_code == 200:
-            return r.json()
-        raise requests.HTTPError(f"{r.status_code}: {r.text}")
+        # thư mục > 100 mục trả nhiều trang: lấy đủ các trang
+        return self._paged_get(f"/projects/{project_id}/repository/tree", params,
+                               etag_key=('tree', project_id, path, ref))
 
-    def get_file_raw(self, project_id, file_path, ref='master'):
+    def get_file_raw(self, project_id, file_path, ref='master', max_bytes=None):
         # GET /projects/:id/repository/files/:file_path/raw?ref=master  (note: file_path must be URL encoded)
-        encoded = quote_plus(file_path)
-        r = requests.get(f"{self.base_url}/projects/{project_id}/repository/files/{encoded}/raw", headers=self.headers, params={'ref': ref}, timeout=30)
-        if r.status_code == 200:
-            return r.content
-        raise requests.HTTPError(f"{r.status_code}: {r.text}")
-
-    def upload_file(self, project_id, file_path):
+        # Đọc stream từng chunk 64 KB; vượt max_bytes thì dừng tải và báo FileTooLargeError
+        prefix = self._project_prefix.get(project_id)
+        if prefix is None:
+            prefix = self._project_prefix[project_id] = f"{self.base_url}/projects/{project_id}/repository/files/"
+        # safe='': mã hóa cả '/' thành %2F như GitLab yêu cầu cho :file_path
+        url = f"{prefix}{quote(file_path, safe='')}/raw"
+
+        def read_body(r):
+            buf = bytearray()
+            for chunk in r.iter_content(65536):
+                buf += chunk
+                if max_bytes is not None and len(buf) > max_bytes:
+                    raise FileTooLargeError(f'File quá lớn để xem (> {max_bytes // 1024} KB)')
+            return bytes(buf)
+
+        data = self._etag_get(('raw', project_id, file_path, ref), url, {'ref': ref}, read_body, timeout=30, stream=True)
+        if max_bytes is not None and len(data) > max_bytes:
+            raise FileTooLargeError(f'File quá lớn để xem (> {max_bytes // 1024} KB)')
+        return data
+
+    def upload_file(self, project_id, file_path, progress_cb=None, timeout=60):
+        """Upload file lên project; progress_cb(bytes_đã_gửi, tổng) nếu có"""
         if not os.path.exists(file_path):
             raise FileNotFoundError('File không tồn tại')
-        with open(file_path, 'rb') as f:
-            files = {'file': f}
-            r = requests.post(f"{self.base_url}/projects/{project_id}/uploads", headers=self.headers, files=files, timeout=60)
+        url = f"{self.base_url}/projects/{project_id}/uploads"
+        if TOOLBELT_AVAILABLE:
+            # MultipartEncoder đọc file theo từng chunk khi gửi => RAM không tăng theo kích thước file
+            with open(file_path, 'rb') as f:
+                enc = MultipartEncoder(fields={'file': (os.path.basename(file_path), f, 'application/octet-stream')})
+                body = MultipartEncoderMonitor(enc, (lambda m: progress_cb(m.bytes_read, m.len)) if progress_cb else None)
+                r = self.session.post(url, headers={'Content-Type': body.content_type}, data=ChunkedBody(body, body.len), timeout=timeout)
+        else:
+            f = ProgressFile(file_path, progress_cb) if progress_cb else open(file_path, 'rb')
+            try:
+                files = {'file': (os.path.basename(file_path), f)}
+                r = self.session.post(url, files=files, timeout=timeout)
+            finally:
+                f.close()
+        if r.status_code in (200,201):
+            return r.json()
+        raise requests.HTTPError(f"{r.status_code}: {r.text}")
+
+    def upload_stream(self, project_id, filename, chunks, content_type='application/zip', timeout=180):
+        """Upload dữ liệu dạng generator (chunked transfer), tự bọc thành multipart field 'file'"""
+        boundary = uuid.uuid4().hex
+        safe_name = filename.replace('"', '%22')
+        head = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{safe_name}"\r\n'
+                f'Content-Type: {content_type}\r\n\r\n').encode('utf-8')
+        tail = f'\r\n--{boundary}--\r\n'.encode('ascii')
+
+        def body():
+            yield head
+            yield from chunks
+            yield tail
+
+        r = self.session.post(f"{self.base_url}/projects/{project_id}/uploads",
+                              headers={'Content-Type': f'multipart/form-data; boundary={boundary}'},
+                              data=body(), timeout=timeout)
         if r.status_code in (200,201):
             return r.json()
         raise requests.HTTPError(f"{r.status_code}: {r.text}")
 
     def commit_files(self, project_id, branch, commit_message, actions):
         # actions: list of {action: 'create'|'update', file_path: ..., content: '...'}
-        payload = {'branch': branch, 'commit_message': commit_message, 'actions': actions}
-        r = requests.post(f"{self.base_url}/projects/{project_id}/repository/commits", headers=self.headers, json=payload, timeout=60)
+        # Nhiều action / payload lớn => chia thành nhiều commit liên tiếp trên cùng branch
+        batches = []
+        cur, cur_size = [], 0
+        for a in actions:
+            size = len(json.dumps(a))
+            if cur and (len(cur) >= COMMIT_BATCH_ACTIONS or cur_size + size > COMMIT_BATCH_BYTES):
+                batches.append(cur)
+                cur, cur_size = [], 0
+            cur.append(a)
+            cur_size += size
+        batches.append(cur)
+        res = None
+        for i, batch in enumerate(batches, 1):
+            msg = commit_message if len(batches) == 1 else f"{commit_message} [part {i}/{len(batches)}]"
+            payload = {'branch': branch, 'commit_message': msg, 'actions': batch}
+            res = self._post_commit(project_id, payload)
+        return res
+
+    @staticmethod
+    def _gzip_rejected(r):
+        """True nếu lỗi cho thấy server không đọc được body gzip (415, lỗi parse JSON, hoặc
+        thiếu cả các tham số bắt buộc vốn luôn có trong payload); lỗi 400 khác (file đã tồn tại...) thì không"""
+        if r.status_code == 415:
+            return True
+        return r.status_code == 400 and bool(_GZIP_REJECT_HINT.search(r.text or ''))
+
+    def _post_commit(self, project_id, payload):
+        url = f"{self.base_url}/projects/{project_id}/repository/commits"
+        if self._gzip_body_ok:
+            body = gzip.compress(json.dumps(payload).encode('utf-8'))
+            r = self.session.post(url, data=body, headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}, timeout=60)
+            if r.status_code in (200,201):
+                return r.json()
+            if not self._gzip_rejected(r):
+                raise requests.HTTPError(f"{r.status_code}: {r.text}")
+            # Server không giải nén request body: gửi lại JSON thường và nhớ lựa chọn này
+            self._gzip_body_ok = False
+        r = self.session.post(url, json=payload, timeout=60)
         if r.status_code in (200,201):
             return r.json()
         raise requests.HTTPError(f"{r.status_code}: {r.text}")
@@ -244,12 +536,321 @@ class GitLabClient:
 # Tiện ích nhỏ
 # ---------------------------
 
+_SLUG_WS = re.compile(r'\s+')
+_SLUG_BAD = re.compile(r'[^a-z0-9\-]')
+
 def slugify(name: str) -> str:
-    import re
-    s = name.strip().lower()
-    s = re.sub(r'\s+', '-', s)
-    s = re.sub(r'[^a-z0-9\-]', '', s)
-    return s[:255]
+    return _SLUG_BAD.sub('', _SLUG_WS.sub('-', name.strip().lower()))[:255]
+
+
+def fold_search(text: str) -> str:
+    """Chuẩn hóa để tìm kiếm không phân biệt hoa/thường và dấu: 'Đồ Án' -> 'do an'"""
+    # NFKD tách dấu thành ký tự combining; 'đ' không tách được nên thay riêng
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(c for c in text if not unicodedata.combining(c)).replace('đ', 'd')
+
+
+def exclude_matcher(patterns):
+    """Gộp các pattern glob ('.git', '*.pyc', ...) thành một regex; trả về hàm match(name) hoặc None"""
+    patterns = [p for p in patterns if p]
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(p) for p in patterns)).match
+
+
+def iter_files(root, exclude_dirs=None, exclude_files=None, max_bytes=None, skipped=None):
+    """Duyệt đệ quy bằng os.scandir (stat có sẵn trong entry), yield (path, size).
+    exclude_dirs(name) / exclude_files(name): bỏ qua thư mục (không duyệt vào) / file có tên khớp;
+    file lớn hơn max_bytes bị bỏ qua và ghi (path, size) vào list skipped nếu có.
+    Symlink tới thư mục không được duyệt vào (như os.walk mặc định); symlink tới file vẫn lấy."""
+    with os.scandir(root) as it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                if not (exclude_dirs and exclude_dirs(e.name)):
+                    yield from iter_files(e.path, exclude_dirs, exclude_files, max_bytes, skipped)
+            elif e.is_file():
+                if exclude_files and exclude_files(e.name):
+                    continue
+                size = e.stat().st_size
+                if max_bytes is not None and size > max_bytes:
+                    if skipped is not None:
+                        skipped.append((e.path, size))
+                    continue
+                yield e.path, size
+
+
+@lru_cache(maxsize=256)
+def lexer_for_name(key):
+    """Lexer Pygments theo đuôi file (hoặc tên file nếu không có đuôi), cache sau lần đầu"""
+    if not PYGMENTS_AVAILABLE:
+        return None
+    # stripnl=False: giữ nguyên dòng trống đầu/cuối để vị trí token khớp số dòng
+    try:
+        return get_lexer_for_filename(key if not key.startswith('.') else 'x' + key, stripnl=False)
+    except Exception:
+        return None
+
+
+def pick_zip_compression(files):
+    """ZIP_STORED nếu >= 50% dung lượng là file đã nén sẵn (ảnh, video, zip...), ngược lại ZIP_DEFLATED"""
+    total = packed = 0
+    for fp, size in files:
+        total += size
+        if os.path.splitext(fp)[1].lower() in COMPRESSED_EXTS:
+            packed += size
+    return zipfile.ZIP_STORED if total and packed * 2 >= total else zipfile.ZIP_DEFLATED
+
+
+ZIP64_LIMIT = 0xFFFFFFFF
+# File nhỏ hơn ngưỡng này được đọc + nén nguyên file trong thread pool (song song);
+# file lớn hơn thì stream từng chunk để không giữ cả file trong RAM
+ZIP_PARALLEL_MAX = 8 * 1024 * 1024
+ZIP_WORKERS = min(32, os.cpu_count() or 1)
+# Tổng byte các file đang nén trước trong pool (tính cả bản nén: 2 x kích thước file)
+ZIP_WINDOW_BYTES = 64 * 1024 * 1024
+ZIP_CREATE_SYSTEM = 0 if sys.platform == 'win32' else 3
+
+
+class ZipStreamWriter:
+    """Tạo dữ liệu file ZIP tuần tự (chỉ ghi nối tiếp, không seek) để gửi thẳng lên mạng.
+    begin() -> local header, end() -> data descriptor, finish() -> central directory.
+    Tự dùng ZIP64 khi file/offset vượt 4 GB hoặc quá 65535 entry."""
+    def __init__(self):
+        self.offset = 0
+        self.entries = []
+        self._cur = None
+
+    def begin(self, arcname, st, method):
+        name = arcname.replace(os.sep, '/').encode('utf-8')
+        t = time.localtime(st.st_mtime)
+        if t.tm_year < 1980:
+            dostime, dosdate = 0, (1 << 5) | 1
+        else:
+            dostime = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+            dosdate = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+        # deflate có thể làm file to ra chút ít => dự phòng 5% như zipfile
+        zip64 = st.st_size * 1.05 >= ZIP64_LIMIT
+        extra = struct.pack('<HHQQ', 1, 16, 0, 0) if zip64 else b''
+        size_field = 0xFFFFFFFF if zip64 else 0
+        version = 45 if zip64 else 20
+        # flag 0x08: crc/size nằm ở data descriptor sau dữ liệu; 0x800: tên file UTF-8
+        header = struct.pack('<IHHHHHIIIHH', 0x04034b50, version, 0x808, method, dostime, dosdate,
+                             0, size_field, size_field, len(name), len(extra)) + name + extra
+        self._cur = (name, method, dostime, dosdate, self.offset, (st.st_mode & 0xFFFF) << 16, zip64)
+        self.offset += len(header)
+        return header
+
+    def end(self, crc, csize, usize):
+        name, method, dostime, dosdate, offset, attr, zip64 = self._cur
+        desc = struct.pack('<IIQQ' if zip64 else '<IIII', 0x08074b50, crc, csize, usize)
+        self.entries.append((name, method, dostime, dosdate, crc, csize, usize, offset, attr))
+        self.offset += csize + len(desc)
+        self._cur = None
+        return desc
+
+    def finish(self):
+        cd_start = self.offset
+        parts = []
+        for name, method, dostime, dosdate, crc, csize, usize, offset, attr in self.entries:
+            ext = []
+            if usize >= ZIP64_LIMIT:
+                ext.append(usize)
+                usize = 0xFFFFFFFF
+            if csize >= ZIP64_LIMIT:
+                ext.append(csize)
+                csize = 0xFFFFFFFF
+            if offset >= ZIP64_LIMIT:
+                ext.append(offset)
+                offset = 0xFFFFFFFF
+            extra = struct.pack('<HH' + 'Q' * len(ext), 1, 8 * len(ext), *ext) if ext else b''
+            version = 45 if ext else 20
+            parts.append(struct.pack('<IHHHHHHIIIHHHHHII', 0x02014b50, (ZIP_CREATE_SYSTEM << 8) | version, version,
+                                     0x808, method, dostime, dosdate, crc, csize, usize, len(name), len(extra),
+                                     0, 0, 0, attr, offset) + name + extra)
+        cd = b''.join(parts)
+        n = len(self.entries)
+        tail = b''
+        if n >= 0xFFFF or cd_start >= ZIP64_LIMIT or len(cd) >= ZIP64_LIMIT:
+            tail += struct.pack('<IQHHIIQQQQ', 0x06064b50, 44, 45, 45, 0, 0, n, n, len(cd), cd_start)
+            tail += struct.pack('<IIQI', 0x07064b50, 0, cd_start + len(cd), 1)
+            n16, cd_size32, cd_start32 = 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF
+        else:
+            n16, cd_size32, cd_start32 = n, len(cd), cd_start
+        tail += struct.pack('<IHHHHIIH', 0x06054b50, 0, 0, n16, n16, cd_size32, cd_start32, 0)
+        self.offset += len(cd) + len(tail)
+        return cd + tail
+
+
+def iter_zip_member(fp, compression, chunk_size=1 << 20, on_read=None):
+    """Đọc file và yield dữ liệu đã nén (deflate raw level 1 hoặc stored); return (crc, csize, usize)"""
+    crc = csize = usize = 0
+    comp = deflate_lib.compressobj(1, zlib.DEFLATED, -15) if compression == zipfile.ZIP_DEFLATED else None
+    with open(fp, 'rb') as f:
+        while True:
+            buf = f.read(chunk_size)
+            if not buf:
+                break
+            usize += len(buf)
+            crc = deflate_lib.crc32(buf, crc)
+            out = comp.compress(buf) if comp else buf
+            if out:
+                csize += len(out)
+                yield out
+            if on_read:
+                on_read(len(buf))
+    if comp:
+        out = comp.flush()
+        if out:
+            csize += len(out)
+            yield out
+    return crc, csize, usize
+
+
+def compress_zip_member(fp, compression):
+    """Đọc + nén nguyên một file (chạy trong worker thread); return (crc, dữ liệu_nén, usize)"""
+    with open(fp, 'rb') as f:
+        data = f.read()
+    crc = deflate_lib.crc32(data)
+    if compression == zipfile.ZIP_DEFLATED:
+        comp = deflate_lib.compressobj(1, zlib.DEFLATED, -15)
+        return crc, comp.compress(data) + comp.flush(), len(data)
+    return crc, data, len(data)
+
+
+def iter_zip_stream(folder, progress_cb=None, chunk_size=1 << 20, files=None, compression=zipfile.ZIP_DEFLATED):
+    """Nén folder thành ZIP và yield từng chunk (~chunk_size), không ghi file .zip tạm ra đĩa.
+    progress_cb(bytes_gốc_đã_đọc, tổng_bytes_gốc) được gọi sau mỗi lần đọc file."""
+    if files is None:
+        files = list(iter_files(folder))
+    total = sum(size for _, size in files)
+    done = 0
+
+    def on_read(n):
+        nonlocal done
+        done += n
+        if progress_cb:
+            progress_cb(done, total)
+
+    def parts():
+        # Kiểu pigz: thread pool nén trước các file kế tiếp (zlib/isal nhả GIL khi nén),
+        # generator ghi ra theo đúng thứ tự. Cửa sổ giới hạn 2*ZIP_WORKERS file và ZIP_WINDOW_BYTES
+        # dữ liệu đang giữ trong RAM (file lớn stream từng chunk nên không tính).
+        zw = ZipStreamWriter()
+        pending = deque()
+        inflight = 0
+        it = iter(files)
+        nxt = next(it, None)
+        with ThreadPoolExecutor(max_workers=ZIP_WORKERS) as ex:
+            def fill():
+                nonlocal nxt, inflight
+                while nxt is not None and len(pending) < ZIP_WORKERS * 2:
+                    fp, size = nxt
+                    small = size <= ZIP_PARALLEL_MAX
+                    cost = 2 * size if small else 0
+                    if pending and inflight + cost > ZIP_WINDOW_BYTES:
+                        return
+                    fut = ex.submit(compress_zip_member, fp, compression) if small else None
+                    pending.append((fp, fut, cost))
+                    inflight += cost
+                    nxt = next(it, None)
+
+            fill()
+            while pending:
+                fp, fut, cost = pending.popleft()
+                yield zw.begin(os.path.relpath(fp, start=folder), os.stat(fp), compression)
+                if fut is None:
+                    crc, csize, usize = yield from iter_zip_member(fp, compression, chunk_size, on_read)
+                else:
+                    crc, data, usize = fut.result()
+                    csize = len(data)
+                    yield data
+                    on_read(usize)
+                yield zw.end(crc, csize, usize)
+                inflight -= cost
+                fill()
+        yield zw.finish()
+
+    # gom các mảnh nhỏ (header, file nhỏ) thành chunk lớn trước khi gửi
+    buf = bytearray()
+    for part in parts():
+        buf += part
+        if len(buf) >= chunk_size:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+@lru_cache(maxsize=None)
+def token_tag(ttype):
+    """Tag màu cho token type, tra theo cây token: Token.Comment.Single -> 'Token.Comment'"""
+    while ttype is not None:
+        name = str(ttype)
+        if name in TOKEN_COLORS:
+            return name
+        ttype = ttype.parent
+    return None
+
+
+def dump_json_file(path, data):
+    # Ghi JSON gọn (không indent); dùng orjson nếu có
+    if ORJSON_AVAILABLE:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_json_file(path):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+# Helper: body upload gửi từng chunk lớn (mặc định 1 MiB) thay vì 8-16 KB mỗi lần đọc
+# của http.client; có __len__ nên requests vẫn gửi Content-Length (không chunked)
+class ChunkedBody:
+    def __init__(self, f, length, chunk_size=1 << 20):
+        self.f = f
+        self.length = length
+        self.chunk_size = chunk_size
+    def __len__(self):
+        return self.length
+    def __iter__(self):
+        while True:
+            chunk = self.f.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+# Helper: gom các lần báo progress từ thread upload, chỉ cập nhật UI tối đa ~30 lần/giây
+# (một win.after đang chờ tại một thời điểm, lúc chạy lấy giá trị mới nhất)
+class ThrottledProgress:
+    def __init__(self, widget, updater, interval=33):
+        self.widget = widget
+        self.updater = updater
+        self.interval = interval
+        self._latest = (0, 0)
+        self._pending = False
+        self._lock = threading.Lock()
+    def __call__(self, current, total):
+        with self._lock:
+            self._latest = (current, total)
+            if self._pending:
+                return
+            self._pending = True
+        try:
+            self.widget.after(self.interval, self._flush)
+        except Exception:
+            with self._lock:
+                self._pending = False
+    def _flush(self):
+        with self._lock:
+            current, total = self._latest
+            self._pending = False
+        self.updater(current, total)
 
 # Helper: wrapper file-like để theo dõi progress khi upload
 class ProgressFile:
@@ -262,10 +863,21 @@ class ProgressFile:
             self.total = 0
         self.read_bytes = 0
         self.callback = callback
+        # Chỉ gọi callback mỗi 64 KB hoặc 50 ms (và khi đọc hết) để không làm chậm upload
+        self._last_cb_bytes = 0
+        self._last_cb_time = 0.0
+        self._cb_bytes_threshold = 65536
+        self._cb_time_threshold = 0.05
     def read(self, size=-1):
         chunk = self.f.read(size)
-        if chunk:
-            self.read_bytes += len(chunk)
+        self.read_bytes += len(chunk)
+        now = time.monotonic()
+        if (not chunk or self.read_bytes - self._last_cb_bytes >= self._cb_bytes_threshold
+                or now - self._last_cb_time >= self._cb_time_threshold):
+            if self.read_bytes == self._last_cb_bytes and self._last_cb_time:
+                return chunk  # đã báo giá trị này rồi
+            self._last_cb_bytes = self.read_bytes
+            self._last_cb_time = now
             try:
                 self.callback(self.read_bytes, self.total)
             except Exception:
@@ -301,13 +913,56 @@ class GitLabGUIApp:
         self.token = None
         self.cache = {}
         self._all_groups = []
+        # Index parent_id -> list group con (đã sort theo tên); root groups ở key None
+        self._by_parent = {}
+        # Index tên -> group: tên viết thường (mọi cấp) và tên root group (chính xác)
+        self._groups_by_name_lower = {}
+        self._root_by_name = {}
+        self._groups_by_id = {}
+        # Danh sách tên dựng sẵn cho combobox của popup tạo mới
+        self._root_group_names = []
+        self._subgroup_names_by_parent_id = {}
+        # Index tìm kiếm: (fold_search(tên), (loại, obj)) cho group/subgroup và project đã tải
+        self._search_index_cf = []
+        self._projects_by_id = {}
+        # Cache repository tree: "project_id:ref:path" -> {'activity': last_activity_at, 'data': [...]}
+        self._tree_cache = {}
+        # Tăng mỗi lần xóa cây để bỏ các lô chèn node còn đang chờ
+        self._tree_gen = 0
+        # Node đang tải con ở worker thread (mở lại trong lúc chờ thì không tải trùng)
+        self._tree_loading = set()
+        # Bản sao các node trong Treeview: iid -> {'text', 'values', 'parent', 'key': fold_search(text)}
+        # để tìm kiếm không phải gọi tree.item() (Tcl) cho từng node
+        self._tree_model = {}
         # Ghi nhớ parent/subgroup để mặc định khi mở popup
         self.last_parent_name = None
         self.last_subgroup_name = None
+        # Bộ lọc khi upload folder (lưu trong cache): pattern thư mục, pattern file, giới hạn MiB
+        self.upload_exclude = ', '.join(EXCLUDE_DIRS)
+        self.upload_exclude_files = ''
+        self.upload_max_mb = UPLOAD_MAX_FILE_MB
 
         # Queue cho thread-safe logging
         self.log_queue = queue.Queue()
 
+        # Highlight nền: job -> worker thread -> kết quả -> main thread (root.after)
+        self._hl_jobs = queue.Queue()
+        self._hl_results = queue.Queue()
+        self._hl_seq = 0
+        self._hl_file = None
+        self._hl_done = set()
+        self._hl_batch = []
+        self._hl_pending = False
+        # số khối đã gửi worker mà chưa nhận kết quả; _hl_busy: đang hiện trạng thái "Đang highlight..."
+        self._hl_outstanding = 0
+        self._hl_busy = False
+        # tag màu đã tag_config trên viewer_text (mỗi tag chỉ cấu hình một lần)
+        self._hl_tags = set()
+        # (project, path, sha1 nội dung, lexer) -> {dòng đầu khối: ranges}, LRU HIGHLIGHT_CACHE_SIZE file
+        self._highlight_cache = OrderedDict()
+        # id tăng dần cho mỗi lần mở file trong viewer
+        self._blob_req = 0
+
         # Tạo layout: top frame (token/login), left tree, right notebook (viewer, log, actions)
         self._build_top()
         self._build_left_tree()
@@ -332,8 +987,9 @@ class GitLabGUIApp:
         if not PYGMENTS_AVAILABLE:
             self.log('Pygments không có: highlight sẽ dùng plain text')
 
-        # Khởi động background thread để xử lý log queue
-        self._start_log_worker()
+        # Đọc log queue trên main thread (Tk không thread-safe)
+        self.root.after(50, self._drain_log)
+        self._start_highlight_worker()
 
         # Load cache nếu có
         self._load_cache()
@@ -417,6 +1073,8 @@ class GitLabGUIApp:
         self.viewer_text = scrolledtext.ScrolledText(self.viewer_frame, wrap='none', font=('Consolas', 11))
         self.viewer_text.pack(fill='both', expand=True)
         self.viewer_text.configure(state='disabled')
+        # Mỗi lần cuộn/đổi kích thước thì highlight thêm vùng mới hiện ra
+        self.viewer_text.configure(yscrollcommand=self._on_viewer_scroll)
 
         # Action buttons under viewer
         act = ttk.Frame(self.viewer_frame)
@@ -462,21 +1120,26 @@ class GitLabGUIApp:
         line = f"[{ts}] {text}"
         self.log_queue.put(line)
 
-    def _start_log_worker(self):
-        def worker():
-            while True:
-                try:
-                    line = self.log_queue.get()
-                    if line is None:
-                        break
-                    self.log_area.configure(state='normal')
-                    self.log_area.insert('end', line + '\n')
-                    self.log_area.see('end')
-                    self.log_area.configure(state='disabled')
-                except Exception:
-                    pass
-        t = threading.Thread(target=worker, daemon=True)
-        t.start()
+    def _drain_log(self):
+        # Lấy tối đa 500 dòng mỗi tick, chèn một lần vào log_area
+        lines = []
+        try:
+            while len(lines) < 500:
+                lines.append(self.log_queue.get_nowait())
+        except queue.Empty:
+            pass
+        if lines:
+            try:
+                self.log_area.configure(state='normal')
+                self.log_area.insert('end', '\n'.join(lines) + '\n')
+                count = int(self.log_area.index('end-1c').split('.')[0])
+                if count > LOG_MAX_LINES:
+                    self.log_area.delete('1.0', f'{count - LOG_MAX_LINES}.0')
+                self.log_area.see('end')
+                self.log_area.configure(state='disabled')
+            except Exception:
+                pass
+        self.root.after(50, self._drain_log)
 
     def save_log(self):
         try:
@@ -493,13 +1156,16 @@ class GitLabGUIApp:
     # ---------------------------
     # Cache
     # ---------------------------
-    def save_cache(self):
+    def save_cache(self, quiet=False):
         try:
-            data = {'groups': self._all_groups, 'last_parent': self.last_parent_name, 'last_subgroup': self.last_subgroup_name}
-            with open(CACHE_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            data = {'groups': self._all_groups, 'last_parent': self.last_parent_name, 'last_subgroup': self.last_subgroup_name,
+                    'trees': self._tree_cache,
+                    'upload_exclude': self.upload_exclude, 'upload_exclude_files': self.upload_exclude_files,
+                    'upload_max_mb': self.upload_max_mb}
+            dump_json_file(CACHE_FILE, data)
             self.log(f'Lưu cache vào {CACHE_FILE}')
-            messagebox.showinfo('Đã lưu', 'Cache đã lưu')
+            if not quiet:
+                messagebox.showinfo('Đã lưu', 'Cache đã lưu')
         except Exception as e:
             self.log(f'Lỗi lưu cache: {e}')
             messagebox.showerror('Lỗi', f'Không thể lưu cache: {e}')
@@ -507,20 +1173,21 @@ class GitLabGUIApp:
     def _load_cache(self):
         if os.path.exists(CACHE_FILE):
             try:
-                with open(CACHE_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                data = load_json_file(CACHE_FILE)
                 self._all_groups = data.get('groups', [])
+                self._reindex_groups()
                 # load last-used parent/subgroup if có
                 self.last_parent_name = data.get('last_parent')
                 self.last_subgroup_name = data.get('last_subgroup')
+                self._tree_cache = data.get('trees', {})
+                self.upload_exclude = data.get('upload_exclude', self.upload_exclude)
+                self.upload_exclude_files = data.get('upload_exclude_files', self.upload_exclude_files)
+                self.upload_max_mb = data.get('upload_max_mb', self.upload_max_mb)
                 self.log('Đã nạp cache groups')
                 # Build minimal tree from cache (root groups)
-                self.tree.delete(*self.tree.get_children())
-                roots = [g for g in self._all_groups if not g.get('parent_id')]
-                for rg in sorted(roots, key=lambda x: x.get('name','').lower()):
-                    iid = f"group_{rg.get('id')}"
-                    self.tree.insert('', 'end', iid=iid, text=rg.get('name'), values=('group', rg.get('id')))
-                    self.tree.insert(iid, 'end', iid=f"{iid}_dummy", text='(mở để tải...)')
+                self._tree_clear()
+                self._insert_nodes('', [(f"group_{rg.get('id')}", rg.get('name'), ('group', rg.get('id')), True)
+                                        for rg in self._by_parent.get(None, [])])
             except Exception as e:
                 self.log(f'Lỗi nạp cache: {e}')
 
@@ -576,7 +1243,8 @@ class GitLabGUIApp:
     # ---------------------------
     # Tree operations: populate groups, lazy load
     # ---------------------------
-    def populate_groups(self):
+    def populate_groups(self, callback=None):
+        """Tải lại groups và dựng lại cây; callback (nếu có) chạy trên UI thread khi cây đã dựng xong"""
         if not self.client:
             messagebox.showerror('Lỗi', 'Bạn cần đăng nhập trước')
             return
@@ -585,14 +1253,15 @@ class GitLabGUIApp:
                 self.set_status('Tải groups...')
                 groups = self.client.list_groups()
                 self._all_groups = groups
+                self._reindex_groups()
                 self.log(f'Tải {len(groups)} groups')
-                # rebuild tree
-                self.tree.delete(*self.tree.get_children())
-                roots = [g for g in groups if not g.get('parent_id')]
-                for rg in sorted(roots, key=lambda x: x.get('name','').lower()):
-                    iid = f"group_{rg.get('id')}"
-                    self.tree.insert('', 'end', iid=iid, text=rg.get('name'), values=('group', rg.get('id')))
-                    self.tree.insert(iid, 'end', iid=f"{iid}_dummy", text='(mở để tải...)')
+                rows = [(f"group_{rg.get('id')}", rg.get('name'), ('group', rg.get('id')), True)
+                        for rg in self._by_parent.get(None, [])]
+                # rebuild tree: xóa + lô đầu chạy trong một callback trên UI thread (vẽ lại một lần)
+                def rebuild():
+                    self._tree_clear()
+                    self._insert_nodes('', rows, done=callback)
+                self.root.after(0, rebuild)
                 # cập nhật combobox trong popup khi tạo
                 # (nếu popup đang mở thì sẽ refresh tự động)
                 self.set_status('Hoàn thành tải groups')
@@ -602,59 +1271,202 @@ class GitLabGUIApp:
                 self.set_status('Lỗi tải groups')
         threading.Thread(target=task, daemon=True).start()
 
+    def _reindex_groups(self):
+        """Dựng lại các index group (theo parent, theo tên) mỗi khi _all_groups thay đổi"""
+        by_parent = defaultdict(list)
+        by_name_lower = {}
+        root_by_name = {}
+        root_names = []
+        for g in (self._all_groups or []):
+            name = g.get('name', '')
+            by_parent[g.get('parent_id') or None].append(g)
+            # setdefault: trùng tên thì giữ group xuất hiện trước (như khi duyệt list)
+            by_name_lower.setdefault(name.strip().lower(), g)
+            if not g.get('parent_id'):
+                root_by_name.setdefault(name, g)
+                root_names.append(name)
+        for lst in by_parent.values():
+            lst.sort(key=lambda x: x.get('name','').lower())
+        self._by_parent = dict(by_parent)
+        self._groups_by_name_lower = by_name_lower
+        self._root_by_name = root_by_name
+        self._groups_by_id = {g.get('id'): g for g in (self._all_groups or [])}
+        self._root_group_names = root_names
+        self._subgroup_names_by_parent_id = {pid: [c.get('name') for c in kids]
+                                             for pid, kids in self._by_parent.items() if pid is not None}
+        self._rebuild_search_index()
+
+    def _rebuild_search_index(self):
+        # group gốc -> node 'group_<id>', group con -> node 'subgroup_<id>'
+        idx = [(fold_search(g.get('name', '')), ('subgroup' if g.get('parent_id') else 'group', g))
+               for g in (self._all_groups or [])]
+        idx += [(fold_search(p.get('name', '')), ('project', p)) for p in self._projects_by_id.values()]
+        self._search_index_cf = idx
+
+    def _index_projects(self, projects):
+        """Thêm project vừa tải vào index tìm kiếm (bỏ qua project đã có)"""
+        for p in projects:
+            if p.get('id') not in self._projects_by_id:
+                self._projects_by_id[p.get('id')] = p
+                self._search_index_cf.append((fold_search(p.get('name', '')), ('project', p)))
+
     def on_tree_open(self, event):
         item = self.tree.focus()
-        if not item:
-            return
+        if item:
+            self._open_node(item)
+
+    def _open_node(self, item, done=None):
+        """Tải con của node (lazy-load); done (nếu có) được gọi khi con của group/subgroup đã chèn xong
+        (các loại node khác: gọi ngay)"""
         v = self.tree.item(item, 'values')
-        if not v:
+        children = self.tree.get_children(item)
+        # Nếu đã tải con (không còn dummy) hoặc đang tải thì skip
+        if (not v or item in self._tree_loading
+                or (children and not any(str(c).startswith(DUMMY_PREFIX) for c in children))):
+            if done:
+                done()
             return
         typ = v[0]
         obj_id = v[1]
-        # Nếu đã tải con (không còn dummy) thì skip
-        children = self.tree.get_children(item)
-        if children and not any(str(c).endswith('_dummy') for c in children):
-            return
+        if typ not in ('group', 'subgroup') and done:
+            self.root.after(0, done)
         # remove dummy
         for c in children:
-            if str(c).endswith('_dummy'):
+            if str(c).startswith(DUMMY_PREFIX):
                 self.tree.delete(c)
+                self._tree_model.pop(c, None)
         if typ == 'group':
-            self._load_subgroups_and_projects(item, int(obj_id))
+            self._load_subgroups_and_projects(item, int(obj_id), done)
         elif typ == 'subgroup':
-            self._load_projects_for_subgroup(item, int(obj_id))
+            self._load_projects_for_subgroup(item, int(obj_id), done)
         elif typ == 'project':
             # add repo root placeholder
             proj_id = int(obj_id)
-            self.tree.insert(item, 'end', iid=f'project_{proj_id}_repo', text='Repository', values=('repo', proj_id))
-            self.tree.insert(f'project_{proj_id}_repo', 'end', iid=f'project_{proj_id}_repo_dummy', text='(mở để tải...)')
+            self._tree_insert(item, f'project_{proj_id}_repo', 'Repository', ('repo', proj_id))
+            self._tree_insert(f'project_{proj_id}_repo', f'{DUMMY_PREFIX}project_{proj_id}_repo', '(mở để tải...)')
+        elif typ == 'repo':
+            self._load_repo_tree(item, int(obj_id), '')
+        elif typ == 'tree':
+            proj_id = self._project_id_of(item)
+            if proj_id is not None:
+                self._load_repo_tree(item, proj_id, obj_id)
+
+    def _project_id_of(self, item):
+        # find project id from ancestors
+        parent = self.tree.parent(item)
+        while parent:
+            v = self.tree.item(parent, 'values')
+            if v and v[0] == 'project':
+                return int(v[1])
+            parent = self.tree.parent(parent)
+        return None
+
+    def _project_ref(self, proj_id):
+        # branch mặc định của project (main/master/...)
+        return self.client.get_project(proj_id).get('default_branch') or 'master'
+
+    def _list_repo_tree_cached(self, proj_id, path):
+        """Dùng cache tree nếu project chưa có hoạt động mới (last_activity_at không đổi)"""
+        proj = self.client.get_project(proj_id)
+        activity = proj.get('last_activity_at')
+        ref = self._project_ref(proj_id)
+        key = f"{proj_id}:{ref}:{path}"
+        entry = self._tree_cache.get(key)
+        if entry and activity and entry.get('activity') == activity:
+            return entry.get('data', [])
+        data = self.client.list_repository_tree(proj_id, path=path, ref=ref)
+        self._tree_cache[key] = {'activity': activity, 'data': data}
+        return data
+
+    def _load_repo_tree(self, item, proj_id, path):
+        # Gọi API ở worker thread (get_project + tree), chèn node trên UI thread qua root.after
+        gen = self._tree_gen
+        self._tree_loading.add(item)
+        self.set_status('Đang tải repository...')
+
+        def task():
+            rows = []
+            try:
+                entries = self._list_repo_tree_cached(proj_id, path)
+                for e in entries:
+                    if e.get('type') == 'tree':
+                        rows.append((f"tree_{proj_id}_{e.get('path')}", e.get('name'), ('tree', e.get('path')), True))
+                    elif e.get('type') == 'blob':
+                        rows.append((f"blob_{proj_id}_{e.get('path')}", e.get('name'), ('blob', e.get('path')), False))
+                self.log(f'Loaded repository tree ({len(rows)}) for project id={proj_id} path={path or "/"}')
+            except Exception as e:
+                self.log(f'Lỗi load repository tree: {e}')
+            self.root.after(0, self._finish_repo_tree, item, rows, gen)
+        threading.Thread(target=task, daemon=True).start()
+
+    def _finish_repo_tree(self, item, rows, gen):
+        self._tree_loading.discard(item)
+        self._insert_nodes(item, rows, gen)
+        self.set_status('Sẵn sàng')
 
-    def _load_subgroups_and_projects(self, item, group_id):
-        # load subgroups from cached _all_groups
+    def _load_subgroups_and_projects(self, item, group_id, done=None):
+        # load subgroups from cached _all_groups (qua index _by_parent)
         try:
-            subgs = [g for g in (self._all_groups or []) if g.get('parent_id') == group_id]
-            for sg in sorted(subgs, key=lambda x: x.get('name','').lower()):
-                iid = f"subgroup_{sg.get('id')}"
-                self.tree.insert(item, 'end', iid=iid, text=sg.get('name'), values=('subgroup', sg.get('id')))
-                self.tree.insert(iid, 'end', iid=f"{iid}_dummy", text='(mở để tải...)')
+            subgs = self._by_parent.get(group_id, [])
+            rows = [(f"subgroup_{sg.get('id')}", sg.get('name'), ('subgroup', sg.get('id')), True)
+                    for sg in subgs]
             # load projects in this group
             projects = self.client.list_projects_in_group(group_id)
-            for p in sorted(projects, key=lambda x: x.get('name','').lower()):
-                iid = f"project_{p.get('id')}"
-                self.tree.insert(item, 'end', iid=iid, text=f"[P] {p.get('name')}", values=('project', p.get('id')))
+            self._index_projects(projects)
+            rows += [(f"project_{p.get('id')}", f"[P] {p.get('name')}", ('project', p.get('id')), False)
+                     for p in sorted(projects, key=lambda x: x.get('name','').lower())]
+            self._insert_nodes(item, rows, done=done)
             self.log(f'Loaded subgroups ({len(subgs)}) and projects ({len(projects)}) for group id={group_id}')
         except Exception as e:
             self.log(f'Lỗi load subgroups/projects: {e}')
+            if done:
+                done()
 
-    def _load_projects_for_subgroup(self, item, subgroup_id):
+    def _load_projects_for_subgroup(self, item, subgroup_id, done=None):
         try:
             projects = self.client.list_projects_in_group(subgroup_id)
-            for p in sorted(projects, key=lambda x: x.get('name','').lower()):
-                iid = f"project_{p.get('id')}"
-                self.tree.insert(item, 'end', iid=iid, text=f"[P] {p.get('name')}", values=('project', p.get('id')))
+            self._index_projects(projects)
+            self._insert_nodes(item, [(f"project_{p.get('id')}", f"[P] {p.get('name')}", ('project', p.get('id')), False)
+                                      for p in sorted(projects, key=lambda x: x.get('name','').lower())], done=done)
             self.log(f'Loaded projects ({len(projects)}) for subgroup id={subgroup_id}')
         except Exception as e:
             self.log(f'Lỗi load projects cho subgroup: {e}')
+            if done:
+                done()
+
+    def _tree_insert(self, parent, iid, text, values=()):
+        """tree.insert và ghi node vào _tree_model"""
+        self.tree.insert(parent, 'end', iid=iid, text=text, values=values)
+        self._tree_model[iid] = {'text': text, 'values': values, 'parent': parent, 'key': fold_search(str(text))}
+
+    def _tree_clear(self):
+        """Xóa toàn bộ cây (và _tree_model); lô chèn node còn chờ sẽ bị bỏ qua"""
+        self.tree.delete(*self.tree.get_children())
+        self._tree_model.clear()
+        self._tree_loading.clear()
+        self._tree_gen += 1
+
+    def _insert_nodes(self, parent, rows, gen=None, done=None):
+        """Chèn node con theo lô TREE_CHUNK; lô sau chạy ở tick sau để UI kịp vẽ.
+        rows: list of (iid, text, values, lazy) - lazy=True thì thêm node dummy để lazy-load
+        done: gọi (qua root.after) khi đã chèn xong lô cuối"""
+        if gen is None:
+            gen = self._tree_gen
+        elif gen != self._tree_gen or (parent and not self.tree.exists(parent)):
+            return  # cây đã được làm mới trong lúc chờ
+        chunk, rest = rows[:TREE_CHUNK], rows[TREE_CHUNK:]
+        try:
+            for iid, text, values, lazy in chunk:
+                self._tree_insert(parent, iid, text, values)
+                if lazy:
+                    self._tree_insert(iid, f"{DUMMY_PREFIX}{iid}", '(mở để tải...)')
+        except Exception as e:
+            self.log(f'Lỗi chèn node: {e}')
+            return
+        if rest:
+            self.root.after(1, partial(self._insert_nodes, parent, rest, gen, done))
+        elif done:
+            self.root.after(0, done)
 
     def on_tree_select(self, event):
         sel = self.tree.selection()
@@ -697,76 +1509,214 @@ class GitLabGUIApp:
             if not sel:
                 return
             item = sel[0]
-            # find project id from ancestors
-            proj_id = None
-            parent = self.tree.parent(item)
-            while parent:
-                v = self.tree.item(parent, 'values')
-                if v and v[0] == 'project':
-                    proj_id = int(v[1])
-                    break
-                parent = self.tree.parent(parent)
+            proj_id = self._project_id_of(item)
             if proj_id is None:
                 return
             self.set_status('Tải file...')
-            content = self.client.get_file_raw(proj_id, path)
+            # mỗi lần chọn file mới tăng id; kết quả của lần chọn cũ sẽ bị bỏ
+            self._blob_req += 1
+            req = self._blob_req
+            threading.Thread(target=self._fetch_blob, args=(req, proj_id, path), daemon=True).start()
+        except Exception as e:
+            self.log(f'Lỗi xem file: {e}')
+            messagebox.showerror('Lỗi', f'Không thể tải file: {e}')
+
+    def _fetch_blob(self, req, proj_id, path):
+        # Worker thread: chỉ gọi mạng, hiển thị thì chuyển về main thread
+        content, err = None, None
+        try:
+            content = self.client.get_file_raw(proj_id, path, ref=self._project_ref(proj_id), max_bytes=VIEWER_MAX_BYTES)
+        except Exception as e:
+            err = e
+        self.root.after(0, self._display_blob, req, proj_id, path, content, err)
+
+    def _display_blob(self, req, proj_id, path, content, err):
+        if req != self._blob_req:
+            return  # người dùng đã chọn file khác
+        try:
+            self._reset_highlight()
+            if isinstance(err, FileTooLargeError):
+                # file quá lớn: báo trong viewer thay vì nội dung file
+                self._set_viewer_text(f'[{err}. Dùng "Download file" để tải về]')
+                self.set_status('File quá lớn để xem')
+                return
+            if err is not None:
+                raise err
             try:
                 text = content.decode('utf-8')
             except Exception:
-                self.viewer_text.configure(state='normal')
-                self.viewer_text.delete('1.0', 'end')
-                self.viewer_text.insert('end', '[Binary file hoặc không phải UTF-8]')
-                self.viewer_text.configure(state='disabled')
+                self._set_viewer_text('[Binary file hoặc không phải UTF-8]')
                 return
-            self.viewer_text.configure(state='normal')
-            self.viewer_text.delete('1.0', 'end')
-            self.viewer_text.insert('end', text)
-            self.viewer_text.configure(state='disabled')
+            self._set_viewer_text(text)
+            self.set_status('Hoàn thành tải file')
             # syntax highlight if pygments available
-            if PYGMENTS_AVAILABLE:
-                try:
-                    lexer = get_lexer_for_filename(path)
-                except Exception:
+            # (kiểm tra kích thước trước: guess_lexer quét cả text trên UI thread)
+            if (PYGMENTS_AVAILABLE and not path.lower().endswith(HIGHLIGHT_SKIP_SUFFIXES)
+                    and self._highlight_allowed(text)):
+                name = os.path.basename(path)
+                lexer = lexer_for_name(os.path.splitext(name)[1].lower() or name)
+                if lexer is None:
                     try:
-                        lexer = guess_lexer(text)
+                        lexer = guess_lexer(text, stripnl=False)
                     except Exception:
                         lexer = None
                 if lexer:
-                    self._apply_syntax_highlight(text, lexer)
-            self.set_status('Hoàn thành tải file')
+                    self._apply_syntax_highlight(text, lexer, key=(proj_id, path, hashlib.sha1(content).digest()))
             self.log(f'Xem file: {path} trong project id={proj_id}')
         except Exception as e:
             self.log(f'Lỗi xem file: {e}')
             messagebox.showerror('Lỗi', f'Không thể tải file: {e}')
 
-    def _apply_syntax_highlight(self, text, lexer):
+    def _set_viewer_text(self, text):
+        self.viewer_text.configure(state='normal')
+        self.viewer_text.delete('1.0', 'end')
+        self.viewer_text.insert('end', text)
+        self.viewer_text.configure(state='disabled')
+
+    def _reset_highlight(self):
+        """Hủy highlight đang chạy (kết quả cũ sẽ bị bỏ qua)"""
+        self._hl_seq += 1
+        self._hl_file = None
+        self._hl_done = set()
+        self._hl_batch = []
+        self._hl_outstanding = 0
+        self._hl_busy = False
+
+    def _highlight_allowed(self, text):
+        """Bỏ qua highlight với file quá lớn / quá nhiều dòng"""
+        if len(text) > HIGHLIGHT_MAX_BYTES:
+            self.log('File quá lớn, bỏ qua highlight')
+            return False
+        if text.count('\n') >= HIGHLIGHT_MAX_LINES:
+            self.log('File quá nhiều dòng, bỏ qua highlight')
+            return False
+        return True
+
+    def _apply_syntax_highlight(self, text, lexer, key=None):
+        """Highlight file mới: worker lex cả file một lần (trạng thái lexer liên tục, token nhiều dòng
+        không bị cắt), main thread chỉ áp range của các khối đang hiển thị, phần còn lại khi cuộn tới.
+        key: nhận diện nội dung file để dùng lại kết quả lex ở lần mở trước"""
+        self._reset_highlight()
+        nlines = text.count('\n') + 1
+        blocks = None
+        if key is not None:
+            key += (lexer.name,)
+            blocks = self._highlight_cache.get(key)
+            if blocks is not None:
+                self._highlight_cache.move_to_end(key)
+        self._hl_file = (self._hl_seq, nlines, blocks)
+        if blocks is None:
+            self._hl_outstanding += 1
+            self._hl_jobs.put((self._hl_seq, text, lexer, key))
+        else:
+            self._request_highlight()
+        if self._hl_outstanding:
+            self._hl_busy = True
+            self.set_status('Đang highlight...')
+
+    def _on_viewer_scroll(self, first, last):
+        self.viewer_text.vbar.set(first, last)
+        if self._hl_file and not self._hl_pending:
+            self._hl_pending = True
+            self.root.after_idle(self._request_highlight)
+
+    def _request_highlight(self):
+        # Đưa range của các khối dòng (visible +/- margin) chưa áp cho drain
+        self._hl_pending = False
+        if not self._hl_file:
+            return
+        seq, nlines, blocks = self._hl_file
+        if blocks is None:
+            return  # worker chưa lex xong
         try:
-            tokens = list(lex(text, lexer))
-            self.viewer_text.configure(state='normal')
-            self.viewer_text.delete('1.0', 'end')
-            # Map token types to simple colors
-            token_color = {
-                'Token.Comment': '#888888',
-                'Token.Keyword': '#0000FF',
-                'Token.Name.Function': '#007F00',
-                'Token.String': '#B22222',
-                'Token.Number': '#FF00FF',
-            }
-            idx = '1.0'
-            for ttype, value in tokens:
-                # insert value
-                self.viewer_text.insert('end', value)
-                # apply tag
-                tag = str(ttype)
-                if not self.viewer_text.tag_cget(tag, 'foreground'):
-                    color = token_color.get(tag.split()[0], None)
-                    if color:
-                        self.viewer_text.tag_config(tag, foreground=color)
-                self.viewer_text.tag_add(tag, idx, 'end')
-                idx = self.viewer_text.index('end')
-            self.viewer_text.configure(state='disabled')
+            first = int(self.viewer_text.index('@0,0').split('.')[0])
+            last = int(self.viewer_text.index(f'@0,{self.viewer_text.winfo_height()}').split('.')[0])
+        except Exception:
+            return
+        b0 = max(0, first - 1 - HIGHLIGHT_MARGIN) // HIGHLIGHT_BLOCK
+        b1 = min(nlines - 1, last - 1 + HIGHLIGHT_MARGIN) // HIGHLIGHT_BLOCK
+        for b in range(b0, b1 + 1):
+            if b not in self._hl_done:
+                self._hl_done.add(b)
+                batch = blocks.get(b * HIGHLIGHT_BLOCK)
+                if batch:
+                    self._hl_outstanding += 1
+                    self._hl_results.put((seq, batch))
+
+    def _on_lexed(self, seq, key, blocks):
+        # Main thread: worker đã lex xong cả file
+        if key is not None:
+            self._highlight_cache[key] = blocks
+            self._highlight_cache.move_to_end(key)
+            if len(self._highlight_cache) > HIGHLIGHT_CACHE_SIZE:
+                self._highlight_cache.popitem(last=False)
+        if seq != self._hl_seq:
+            return
+        self._hl_outstanding -= 1
+        self._hl_file = (seq, self._hl_file[1], blocks)
+        self._request_highlight()
+
+    def _start_highlight_worker(self):
+        def worker():
+            while True:
+                job = self._hl_jobs.get()
+                if job is None:
+                    break
+                seq, text, lexer, key = job
+                if seq != self._hl_seq:
+                    continue
+                try:
+                    # Bảng offset đầu mỗi dòng (tính một lần/file): offset -> "dòng.cột" bằng bisect
+                    line_starts = list(accumulate((len(ln) + 1 for ln in text.split('\n')), initial=0))
+                    # Gom theo khối dòng rồi theo tag: khối -> tag -> [start, end, ...] để tag_add một lần/tag.
+                    # Token nhiều dòng thuộc khối chứa điểm đầu của nó.
+                    ranges = defaultdict(lambda: defaultdict(list))
+                    for off, ttype, value in lexer.get_tokens_unprocessed(text):
+                        tag = token_tag(ttype)
+                        if not tag:
+                            continue
+                        i = bisect_right(line_starts, off) - 1
+                        end = off + len(value)
+                        j = bisect_right(line_starts, end) - 1
+                        ranges[i - i % HIGHLIGHT_BLOCK][tag].extend(
+                            (f'{i + 1}.{off - line_starts[i]}', f'{j + 1}.{end - line_starts[j]}'))
+                    blocks = {start: list(tags.items()) for start, tags in ranges.items()}
+                except Exception as e:
+                    self.log(f'Lỗi highlight: {e}')
+                    key, blocks = None, {}
+                self.root.after(0, self._on_lexed, seq, key, blocks)
+        t = threading.Thread(target=worker, daemon=True)
+        t.start()
+        self.root.after(30, self._drain_highlight)
+
+    def _drain_highlight(self):
+        # Main thread: mỗi tick áp khoảng HIGHLIGHT_OPS_PER_TICK range để UI không bị đứng.
+        # Tk nhận nhiều cặp "start end" trong một lệnh tag_add -> một lần gọi cho mỗi tag.
+        budget = HIGHLIGHT_OPS_PER_TICK
+        try:
+            while budget > 0:
+                if not self._hl_batch:
+                    seq, batch = self._hl_results.get_nowait()
+                    if seq != self._hl_seq:
+                        continue
+                    self._hl_outstanding -= 1
+                    self._hl_batch = list(batch)  # batch có thể nằm trong _highlight_cache: không pop trực tiếp
+                    if not batch:
+                        continue
+                tag, indices = self._hl_batch.pop()
+                if tag not in self._hl_tags:
+                    self.viewer_text.tag_config(tag, foreground=TOKEN_COLORS[tag])
+                    self._hl_tags.add(tag)
+                self.viewer_text.tag_add(tag, *indices)
+                budget -= len(indices) // 2
+        except queue.Empty:
+            pass
         except Exception as e:
             self.log(f'Lỗi highlight: {e}')
+        if self._hl_busy and not self._hl_outstanding and not self._hl_batch:
+            self._hl_busy = False
+            self.set_status('Hoàn thành highlight')
+        self.root.after(30, self._drain_highlight)
 
     # ---------------------------
     # Repo viewer lazy-load and download
@@ -782,19 +1732,11 @@ class GitLabGUIApp:
             messagebox.showerror('Lỗi', 'Vui lòng chọn file (blob) để download')
             return
         path = v[1]
-        # find project id
-        proj_id = None
-        parent = self.tree.parent(item)
-        while parent:
-            vv = self.tree.item(parent, 'values')
-            if vv and vv[0] == 'project':
-                proj_id = int(vv[1])
-                break
-            parent = self.tree.parent(parent)
+        proj_id = self._project_id_of(item)
         if proj_id is None:
             return
         try:
-            content = self.client.get_file_raw(proj_id, path)
+            content = self.client.get_file_raw(proj_id, path, ref=self._project_ref(proj_id))
             # save
             initial = os.path.basename(path)
             fn = filedialog.asksaveasfilename(title='Tải file về', initialfile=initial)
@@ -826,29 +1768,24 @@ class GitLabGUIApp:
         if not fn:
             return
         def task():
+            close = None
             try:
                 self.set_status('Uploading...')
-                win, updater, close = self.show_progress_window('Uploading file...')
-                def cb(read_bytes, total):
-                    win.after(0, lambda: updater(read_bytes, total))
-                pf = ProgressFile(fn, cb)
-                files = {'file': (os.path.basename(fn), pf)}
-                headers = self.client.headers.copy()
-                headers.pop('Content-Type', None)
-                r = requests.post(f"{self.client.base_url}/projects/{self.current_project_id}/uploads", headers=headers, files=files, timeout=120)
-                pf.close()
-                close()
-                if r.status_code in (200,201):
-                    res = r.json()
-                    url = res.get('url') or str(res)
-                    self.log(f'Upload file {fn} -> {url} (project {self.current_project_id})')
-                    win.after(0, lambda: self.toast(f'Upload hoàn tất: {url}', timeout=3000))
-                else:
-                    raise requests.HTTPError(f"{r.status_code}: {r.text}")
+                cb = None
+                if os.path.getsize(fn) >= PROGRESS_MIN_BYTES:
+                    win, updater, close = self.show_progress_window('Uploading file...')
+                    cb = ThrottledProgress(win, updater)
+                # upload_file stream multipart (requests-toolbelt) nên RAM không tăng theo kích thước file
+                res = self.client.upload_file(self.current_project_id, fn, progress_cb=cb, timeout=120)
+                url = res.get('url') or str(res)
+                self.log(f'Upload file {fn} -> {url} (project {self.current_project_id})')
+                self.root.after(0, lambda: self.toast(f'Upload hoàn tất: {url}', timeout=3000))
             except Exception as e:
                 self.log(f'Lỗi upload: {e}')
                 messagebox.showerror('Lỗi upload', str(e))
             finally:
+                if close:
+                    close()
                 self.set_status('Sẵn sàng')
         threading.Thread(target=task, daemon=True).start()
 
@@ -862,45 +1799,103 @@ class GitLabGUIApp:
         folder = filedialog.askdirectory(title='Chọn folder để upload (sẽ zip và upload)')
         if not folder:
             return
-        # zip folder
+        base = os.path.basename(folder.rstrip('/\\'))
         try:
-            base = os.path.basename(folder.rstrip('/\\'))
-            zipname = os.path.join(os.path.expanduser('~'), f"{base}.zip")
-            with zipfile.ZipFile(zipname, 'w', zipfile.ZIP_DEFLATED) as zf:
-                for root, dirs, files in os.walk(folder):
-                    for f in files:
-                        fp = os.path.join(root, f)
-                        arcname = os.path.relpath(fp, start=folder)
-                        zf.write(fp, arcname)
-            # upload zip
-            def task():
-                try:
-                    self.set_status('Uploading zip...')
+            files, skipped = self._list_upload_files(folder)
+        except Exception as e:
+            messagebox.showerror('Lỗi', f'Không thể đọc folder: {e}')
+            return
+        settings = (self.upload_exclude, self.upload_exclude_files, self.upload_max_mb)
+        compression = self._ask_zip_compression(pick_zip_compression(files))
+        if compression is None:
+            return
+        if (self.upload_exclude, self.upload_exclude_files, self.upload_max_mb) != settings:
+            # đổi bộ lọc trong popup: duyệt lại folder và lưu lựa chọn vào cache
+            self.save_cache(quiet=True)
+            try:
+                files, skipped = self._list_upload_files(folder)
+            except Exception as e:
+                messagebox.showerror('Lỗi', f'Không thể đọc folder: {e}')
+                return
+        for fp, size in skipped:
+            self.log(f'Cảnh báo: bỏ qua file lớn {fp} ({size} bytes > {self.upload_max_mb} MiB)')
+        if not files:
+            messagebox.showwarning('Upload folder', 'Không còn file nào để upload sau khi lọc')
+            return
+        # nén và upload cùng lúc (stream), không tạo file zip tạm
+        def task():
+            close = None
+            try:
+                self.set_status('Uploading zip...')
+                cb = None
+                if sum(size for _, size in files) >= PROGRESS_MIN_BYTES:
                     win, updater, close = self.show_progress_window('Uploading zip...')
-                    def cb(read_bytes, total):
-                        win.after(0, lambda: updater(read_bytes, total))
-                    pf = ProgressFile(zipname, cb)
-                    files = {'file': (os.path.basename(zipname), pf)}
-                    headers = self.client.headers.copy()
-                    headers.pop('Content-Type', None)
-                    r = requests.post(f"{self.client.base_url}/projects/{self.current_project_id}/uploads", headers=headers, files=files, timeout=180)
-                    pf.close()
+                    cb = ThrottledProgress(win, updater)
+                chunks = iter_zip_stream(folder, cb, files=files, compression=compression)
+                res = self.client.upload_stream(self.current_project_id, f"{base}.zip", chunks)
+                url = res.get('url') or str(res)
+                self.log(f'Upload folder {folder} as {base}.zip -> {url}')
+                self.root.after(0, lambda: self.toast(f'Upload hoàn tất: {url}', timeout=3000))
+            except Exception as e:
+                self.log(f'Lỗi upload folder: {e}')
+                messagebox.showerror('Lỗi', str(e))
+            finally:
+                if close:
                     close()
-                    if r.status_code in (200,201):
-                        res = r.json()
-                        url = res.get('url') or str(res)
-                        self.log(f'Upload folder {folder} as {zipname} -> {url}')
-                        win.after(0, lambda: self.toast(f'Upload hoàn tất: {url}', timeout=3000))
-                    else:
-                        raise requests.HTTPError(f"{r.status_code}: {r.text}")
-                except Exception as e:
-                    self.log(f'Lỗi upload folder: {e}')
-                    messagebox.showerror('Lỗi', str(e))
-                finally:
-                    self.set_status('Sẵn sàng')
-            threading.Thread(target=task, daemon=True).start()
-        except Exception as e:
-            messagebox.showerror('Lỗi', f'Không thể nén folder: {e}')
+                self.set_status('Sẵn sàng')
+        threading.Thread(target=task, daemon=True).start()
+
+    def _list_upload_files(self, folder):
+        """Danh sách (path, size) sẽ upload theo bộ lọc hiện tại, kèm list file bị bỏ vì quá lớn"""
+        skipped = []
+        exclude_dirs = exclude_matcher(p.strip() for p in self.upload_exclude.split(','))
+        exclude_files = exclude_matcher(p.strip() for p in self.upload_exclude_files.split(','))
+        max_bytes = int(self.upload_max_mb * 1024 * 1024) if self.upload_max_mb and self.upload_max_mb > 0 else None
+        return list(iter_files(folder, exclude_dirs, exclude_files, max_bytes, skipped)), skipped
+
+    def _ask_zip_compression(self, default):
+        """Popup chọn kiểu nén và bộ lọc file khi upload folder; trả về zipfile.ZIP_* hoặc None nếu hủy.
+        Bộ lọc (upload_exclude, upload_exclude_files, upload_max_mb) được cập nhật khi bấm Upload."""
+        win = tk.Toplevel(self.root)
+        win.title('Upload folder')
+        win.transient(self.root)
+        ttk.Label(win, text='Kiểu nén:').pack(anchor='w', padx=8, pady=(8,0))
+        # 1 = nén nhanh (deflate level 1), 0 = không nén (hợp với ảnh/video/zip)
+        mode = tk.IntVar(value=1 if default == zipfile.ZIP_DEFLATED else 0)
+        ttk.Radiobutton(win, text='Nén nhanh', variable=mode, value=1).pack(anchor='w', padx=8)
+        ttk.Radiobutton(win, text='Không nén', variable=mode, value=0).pack(anchor='w', padx=8)
+        ttk.Label(win, text='Bỏ qua thư mục (cách nhau bởi dấu phẩy, vd: .git, node_modules):').pack(anchor='w', padx=8, pady=(8,0))
+        exclude_var = tk.StringVar(value=self.upload_exclude)
+        ttk.Entry(win, textvariable=exclude_var, width=50).pack(padx=8, fill='x')
+        ttk.Label(win, text='Bỏ qua file (cách nhau bởi dấu phẩy, vd: *.pyc, *.log):').pack(anchor='w', padx=8, pady=(8,0))
+        exclude_files_var = tk.StringVar(value=self.upload_exclude_files)
+        ttk.Entry(win, textvariable=exclude_files_var, width=50).pack(padx=8, fill='x')
+        ttk.Label(win, text='Bỏ qua file lớn hơn (MiB, 0 = không giới hạn):').pack(anchor='w', padx=8, pady=(8,0))
+        max_var = tk.StringVar(value=str(self.upload_max_mb))
+        ttk.Entry(win, textvariable=max_var, width=10).pack(anchor='w', padx=8)
+        result = {}
+        def ok():
+            try:
+                max_mb = float(max_var.get().strip() or 0)
+            except ValueError:
+                max_mb = -1
+            if not math.isfinite(max_mb) or max_mb < 0:
+                messagebox.showerror('Lỗi', 'Giới hạn kích thước phải là số >= 0', parent=win)
+                return
+            self.upload_exclude = exclude_var.get().strip()
+            self.upload_exclude_files = exclude_files_var.get().strip()
+            self.upload_max_mb = int(max_mb) if max_mb == int(max_mb) else max_mb
+            result['compression'] = zipfile.ZIP_DEFLATED if mode.get() else zipfile.ZIP_STORED
+            win.destroy()
+        btn_frame = ttk.Frame(win)
+        btn_frame.pack(pady=8)
+        ttk.Button(btn_frame, text='Upload', command=ok).pack(side='left', padx=6)
+        ttk.Button(btn_frame, text='Hủy', command=win.destroy).pack(side='left', padx=6)
+        # grab chỉ khi cửa sổ đã hiển thị (X11 báo "grab failed: window not viewable"), như simpledialog
+        win.wait_visibility()
+        win.grab_set()
+        win.wait_window()
+        return result.get('compression')
 
     # ---------------------------
     # Create group/subgroup/project via popup
@@ -925,7 +1920,7 @@ class GitLabGUIApp:
         name_entry.focus_set()
 
         ttk.Label(win, text='Parent Group (chỉ cho Subgroup/Project):').pack(anchor='w', padx=8, pady=(8,0))
-        parent_combo = ttk.Combobox(win, values=[g.get('name') for g in self._all_groups if not g.get('parent_id')], state='readonly')
+        parent_combo = ttk.Combobox(win, values=self._root_group_names, state='readonly')
         parent_combo.pack(padx=8, fill='x')
         # nếu đã có last-used parent, chọn làm mặc định
         if self.last_parent_name:
@@ -945,15 +1940,11 @@ class GitLabGUIApp:
             if not sel:
                 subgroup_combo['values'] = []
                 return
-            gid = None
-            for g in self._all_groups:
-                if g.get('name') == sel and not g.get('parent_id'):
-                    gid = g.get('id')
-                    break
-            if gid is None:
+            g = self._root_by_name.get(sel)
+            if g is None:
                 subgroup_combo['values'] = []
                 return
-            subs = [s.get('name') for s in self._all_groups if s.get('parent_id') == gid]
+            subs = self._subgroup_names_by_parent_id.get(g.get('id'), [])
             subgroup_combo['values'] = subs
             # nếu có last_subgroup phù hợp thì đặt mặc định
             if self.last_subgroup_name and self.last_subgroup_name in subs:
@@ -990,23 +1981,18 @@ class GitLabGUIApp:
                         self.last_subgroup_name = None
                         self.log(f'Tạo group: {name} (id={res.get("id")})')
                         win.after(0, lambda: self.toast(f"Đã tạo group {res.get('name')}", timeout=2000))
-                        # thêm vào tree
-                        iid = f"group_{res.get('id')}"
-                        self.tree.insert('', 'end', iid=iid, text=res.get('name'), values=('group', res.get('id')))
-                        self.tree.insert(iid, 'end', iid=f"{iid}_dummy", text='(mở để tải...)')
-                        # cập nhật cache
+                        # thêm vào tree (trên UI thread)
+                        self.root.after(0, partial(self._insert_nodes, '',
+                                                   [(f"group_{res.get('id')}", res.get('name'), ('group', res.get('id')), True)]))
+                        # cập nhật cache (một lần gọi API, dùng chung cho combobox bên dưới)
                         self._all_groups = self.client.list_groups()
+                        self._reindex_groups()
                         # Hành động sau khi tạo: giữ popup hay đóng tùy chọn
                         if keep_open_var.get():
                             # Clear fields and focus for next create
                             win.after(0, clear_fields)
-                            try:
-                                new_groups = self.client.list_groups()
-                                self._all_groups = new_groups
-                                win.after(0, lambda: parent_combo.configure(values=[g.get('name') for g in new_groups if not g.get('parent_id')]))
-                                win.after(0, lambda: self.save_cache())
-                            except Exception:
-                                pass
+                            win.after(0, lambda: parent_combo.configure(values=self._root_group_names))
+                            win.after(0, lambda: self.save_cache())
                         else:
                             win.after(0, win.destroy)
                     elif choice == 'subgroup':
@@ -1024,21 +2010,17 @@ class GitLabGUIApp:
                         self.log(f'Tạo subgroup: {name} (id={res.get("id")}) under group {parent}')
                         win.after(0, lambda: self.toast(f"Đã tạo subgroup {res.get('name')}", timeout=2000))
                         # cập nhật tree
-                        parent_iid = f"group_{g.get('id')}"
-                        if self.tree.exists(parent_iid):
-                            self.tree.insert(parent_iid, 'end', iid=f"subgroup_{res.get('id')}", text=res.get('name'), values=('subgroup', res.get('id')))
-                            self.tree.insert(f"subgroup_{res.get('id')}", 'end', iid=f"subgroup_{res.get('id')}_dummy", text='(mở để tải...)')
+                        # (_insert_nodes với gen bỏ qua nếu node cha không có trong cây)
+                        self.root.after(0, partial(self._insert_nodes, f"group_{g.get('id')}",
+                                                   [(f"subgroup_{res.get('id')}", res.get('name'), ('subgroup', res.get('id')), True)],
+                                                   self._tree_gen))
                         self._all_groups = self.client.list_groups()
+                        self._reindex_groups()
                         # Hành động sau khi tạo
                         if keep_open_var.get():
                             win.after(0, clear_fields)
-                            try:
-                                new_groups = self.client.list_groups()
-                                self._all_groups = new_groups
-                                win.after(0, lambda: parent_combo.configure(values=[g.get('name') for g in new_groups if not g.get('parent_id')]))
-                                win.after(0, lambda: self.save_cache())
-                            except Exception:
-                                pass
+                            win.after(0, lambda: parent_combo.configure(values=self._root_group_names))
+                            win.after(0, lambda: self.save_cache())
                         else:
                             win.after(0, win.destroy)
                     elif choice == 'project':
@@ -1048,7 +2030,7 @@ class GitLabGUIApp:
                             # find subgroup by name under parent
                             # find parent id
                             pg = self.find_group_by_name(parent) if parent else None
-                            subs = [s for s in (self._all_groups or []) if s.get('name') == sub and s.get('parent_id') == (pg.get('id') if pg else None)]
+                            subs = [s for s in self._by_parent.get(pg.get('id') if pg else None, ()) if s.get('name') == sub]
                             if subs:
                                 namespace_id = subs[0].get('id')
                         if namespace_id is None and parent:
@@ -1066,17 +2048,15 @@ class GitLabGUIApp:
                             self.last_parent_name = parent
                         self.log(f'Tạo project: {name} (id={res.get("id")}) in namespace {namespace_id}')
                         win.after(0, lambda: self.toast(f"Đã tạo project {res.get('name')}", timeout=2000))
-                        # cập nhật tree: tìm parent node
-                        parent_iid_group = f"group_{namespace_id}"
-                        parent_iid_sub = f"subgroup_{namespace_id}"
-                        parent_iid = None
-                        if self.tree.exists(parent_iid_group):
-                            parent_iid = parent_iid_group
-                        elif self.tree.exists(parent_iid_sub):
-                            parent_iid = parent_iid_sub
-                        if parent_iid:
-                            new_iid = f"project_{res.get('id')}"
-                            self.tree.insert(parent_iid, 'end', iid=new_iid, text=f"[P] {res.get('name')}", values=('project', res.get('id')))
+                        self._index_projects([res])
+                        # cập nhật tree trên UI thread: parent là group hoặc subgroup theo namespace
+                        def add_project_node(res=res, namespace_id=namespace_id):
+                            for parent_iid in (f"group_{namespace_id}", f"subgroup_{namespace_id}"):
+                                if self.tree.exists(parent_iid):
+                                    self._insert_nodes(parent_iid, [(f"project_{res.get('id')}", f"[P] {res.get('name')}",
+                                                                     ('project', res.get('id')), False)])
+                                    break
+                        self.root.after(0, add_project_node)
                         # Lưu last-used và cache
                         win.after(0, lambda: self.save_cache())
                         # Hành động sau khi tạo project
@@ -1104,16 +2084,13 @@ class GitLabGUIApp:
         ttk.Button(btn_frame, text='Đóng', command=win.destroy).pack(side='left', padx=6)
 
     def find_group_by_name(self, name: str):
-        for g in (self._all_groups or []):
-            if g.get('name', '').strip().lower() == name.strip().lower():
-                return g
-        return None
+        return self._groups_by_name_lower.get(name.strip().lower())
 
     # ---------------------------
     # Search feature: mở node chứa kết quả
     # ---------------------------
     def on_search(self):
-        q = self.search_var.get().strip().lower()
+        q = fold_search(self.search_var.get().strip())
         if not q:
             messagebox.showinfo('Tìm kiếm', 'Nhập từ khóa tìm kiếm')
             return
@@ -1121,51 +2098,75 @@ class GitLabGUIApp:
         def task():
             try:
                 self.set_status('Tìm kiếm...')
-                # tìm group hoặc project
-                matches = []
-                for g in (self._all_groups or []):
-                    if q in g.get('name','').lower():
-                        matches.append(('group', g))
-                # tìm projects by calling API for each group (could be heavy) - ta dùng tree loaded nodes first
-                for gid in [n for n in self.tree.get_children('')]:
-                    # expand and check children
-                    for child in self.tree.get_children(gid):
-                        text = self.tree.item(child, 'text')
-                        if q in str(text).lower():
-                            v = self.tree.item(child, 'values')
-                            if v:
-                                matches.append((v[0], {'id': int(v[1]), 'name': text}))
+                # tìm group/subgroup/project trong index dựng sẵn (tên đã chuẩn hóa, không gọi Tk)
+                matches = [m for name, m in self._search_index_cf if q in name]
                 if not matches:
+                    # không có trong index: tìm các node đã tải trong cây (thư mục/file repo...) qua _tree_model
+                    for iid, node in list(self._tree_model.items()):
+                        if node['values'] and q in node['key']:
+                            typ, obj_id = node['values'][0], node['values'][1]
+                            self.root.after(0, partial(self._finish_search, typ, {'id': obj_id, 'name': node['text']}, iid))
+                            return
                     messagebox.showinfo('Tìm kiếm', 'Không tìm thấy')
                     self.set_status('Không tìm thấy')
                     return
                 # chọn kết quả đầu tiên: mở cây tương ứng
                 typ, obj = matches[0]
-                if typ == 'group':
-                    iid = f"group_{obj.get('id')}"
-                    if not self.tree.exists(iid):
-                        # refresh groups
-                        self.populate_groups()
-                        time.sleep(1)
-                    self.tree.see(iid)
-                    self.tree.selection_set(iid)
+                # loại trong index trùng tiền tố iid của node: group_/subgroup_/project_
+                if self.tree.exists(f"{typ}_{obj.get('id')}"):
+                    self.root.after(0, partial(self._finish_search, typ, obj))
+                elif typ == 'group':
+                    # group gốc chưa có trong cây: refresh groups rồi chọn node khi cây dựng xong
+                    self.populate_groups(partial(self._finish_search, typ, obj))
                 else:
-                    # project or subgroup
-                    iid = f"{typ}_{obj.get('id')}"
-                    if not self.tree.exists(iid):
-                        # try reloading group's children
-                        self.populate_groups()
-                        time.sleep(1)
-                    self.tree.see(iid)
-                    self.tree.selection_set(iid)
-                self.set_status('Hoàn thành tìm kiếm')
+                    # subgroup/project: mở dần các group chứa nó (không dựng lại cả cây)
+                    self.root.after(0, partial(self._reveal_search_hit, typ, obj))
             except Exception as e:
                 self.log(f'Lỗi tìm kiếm: {e}')
                 messagebox.showerror('Lỗi', f'Error: {e}')
-            finally:
                 self.set_status('Sẵn sàng')
         threading.Thread(target=task, daemon=True).start()
 
+    def _search_ancestors(self, typ, obj):
+        """iid các node group/subgroup cần mở (gốc -> cha trực tiếp) để thấy kết quả tìm kiếm"""
+        if typ == 'subgroup':
+            gid = obj.get('parent_id')
+        else:
+            ns = obj.get('namespace') or {}
+            gid = ns.get('id') if ns.get('kind') == 'group' else None
+        chain = []
+        while gid:
+            g = self._groups_by_id.get(gid)
+            if g is None:
+                break
+            chain.append(gid)
+            gid = g.get('parent_id')
+        chain.reverse()
+        return [f"group_{gid}" if i == 0 else f"subgroup_{gid}" for i, gid in enumerate(chain)]
+
+    def _reveal_search_hit(self, typ, obj):
+        self._expand_path(self._search_ancestors(typ, obj), partial(self._finish_search, typ, obj))
+
+    def _expand_path(self, iids, done):
+        # Mở lần lượt từng node (đợi tải con xong mới mở node kế tiếp), cuối cùng gọi done
+        if not iids or not self.tree.exists(iids[0]):
+            done()
+            return
+        self.tree.item(iids[0], open=True)
+        self._open_node(iids[0], partial(self._expand_path, iids[1:], done))
+
+    def _finish_search(self, typ, obj, iid=None):
+        """Chọn và cuộn tới node kết quả tìm kiếm (chạy trên UI thread)"""
+        iid = iid or f"{typ}_{obj.get('id')}"
+        if self.tree.exists(iid):
+            self.tree.see(iid)
+            self.tree.selection_set(iid)
+            self.set_status('Hoàn thành tìm kiếm')
+        else:
+            # subgroup/project chỉ có trong cây sau khi mở group chứa nó
+            messagebox.showinfo('Tìm kiếm', f"Tìm thấy '{obj.get('name')}' nhưng chưa hiển thị trong cây; mở group chứa nó để xem")
+            self.set_status('Sẵn sàng')
+
     def on_clear_search(self):
         self.search_var.set('')
         self.set_status('Sẵn sàng')
@@ -1205,7 +2206,6 @@ class GitLabGUIApp:
             try:
                 pbar.config(maximum=max(1, total), value=current)
                 lbl.config(text=f'{current}/{total} bytes')
-                win.update_idletasks()
             except Exception:
                 pass
         def close():